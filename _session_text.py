@@ -0,0 +1,61 @@
+"""
+Item text helpers used by the session logic.
+
+Kept free of other app imports and fully typed so the module can be
+compiled with mypyc for lower call overhead:
+
+    pip install mypy && mypyc _session_text.py
+
+Python imports the built extension in preference to this file; without it
+the pure-Python version is used unchanged.
+"""
+
+import string
+from functools import lru_cache
+
+# Lowercase A-Z and drop every byte that is not an ASCII letter or digit
+_ASCII_LOWER_TABLE = bytes.maketrans(string.ascii_uppercase.encode(), string.ascii_lowercase.encode())
+_ASCII_DROP = bytes(
+    b for b in range(256) if chr(b) not in string.ascii_letters and chr(b) not in string.digits
+)
+
+
+@lru_cache(maxsize=4096)
+def normalize_item(item: str) -> str:
+    """
+    Normalize an item for comparison.
+    Strips whitespace, special characters, and converts to lowercase.
+    """
+    # Already clean (isalnum/islower alone would also accept letters like "ä")
+    if item.isascii() and item.isalnum() and item.islower():
+        return item
+    # Only ASCII alphanumerics survive, so non-ASCII characters can be dropped
+    # while encoding and the rest handled in a single bytes.translate pass
+    return item.encode("ascii", "ignore").translate(_ASCII_LOWER_TABLE, _ASCII_DROP).decode("ascii")
+
+
+def is_storable_item(item: str) -> bool:
+    """Check that an item can be stored as UTF-8 (lone surrogates cannot)."""
+    try:
+        item.encode("utf-8")
+    except UnicodeEncodeError:
+        return False
+    return True
+
+
+def items_equal(item1: str, item2: str) -> bool:
+    """
+    Check if two items are equal after normalization.
+    Kept for callers comparing a single pair; loops should compare
+    normalize_item() keys or sets of them instead.
+    """
+    return normalize_item(item1) == normalize_item(item2)
+
+
+def is_duplicate_item(new_item: str, existing_items: list[str]) -> bool:
+    """Check if a new item is a duplicate of any existing item."""
+    new_normalized = normalize_item(new_item)
+    if not new_normalized:
+        return True  # Empty items are considered duplicates
+    # Stop at the first match instead of normalizing the whole list
+    return any(normalize_item(item) == new_normalized for item in existing_items)
@@ -2,67 +2,349 @@
 SQLite database module for session persistence.
 """
 
+import atexit
+import os
+import queue
 import sqlite3
-import json
 import time
 import threading
+from concurrent.futures import Future
 from pathlib import Path
 from typing import Optional
+from collections import namedtuple
 from contextlib import contextmanager
 
+try:
+    from orjson import loads as _loads
+except ImportError:  # Fall back to stdlib where orjson has no wheel
+    from json import loads as _loads
+
+# Columns aliased as "name [JSON]" are decoded while sqlite3 builds the row
+sqlite3.register_converter("JSON", _loads)
+
 DATABASE_PATH = Path("sessions.db")
 SESSION_EXPIRY_DAYS = 7
 SESSION_EXPIRY_SECONDS = SESSION_EXPIRY_DAYS * 24 * 60 * 60
 
-_local = threading.local()
-
-
-def get_connection() -> sqlite3.Connection:
-    """Get a thread-local database connection."""
-    if not hasattr(_local, "connection"):
-        _local.connection = sqlite3.connect(str(DATABASE_PATH), check_same_thread=False)
-        _local.connection.row_factory = sqlite3.Row
-    return _local.connection
+# Bump when init_database changes the schema
+SCHEMA_VERSION = 5
+
+# Large enough to hold every statement below, so cache hits are deterministic
+STATEMENT_CACHE_SIZE = 256
+
+# Tables whose statistics are refreshed after expired sessions are removed
+ANALYZED_TABLES = (
+    "sessions", "members", "member_items", "member_accepted",
+    "session_excluded", "session_restart_votes"
+)
+
+# Heartbeat last_seen writes are coalesced to at most one per member per window
+LAST_SEEN_DEBOUNCE = 5.0
+
+# Number of pooled read-only connections
+READ_POOL_SIZE = min(8, (os.cpu_count() or 1) * 2)
+
+# Single-writer queue: hot mutations are committed in batches by one thread.
+# Batches are whatever piled up while the previous commit ran.
+WRITE_BATCH_SIZE = 500
+
+# SQL statements, kept at module level so the sqlite3 statement cache reuses
+# the same prepared statement for every call
+SQL_DELETE_EXPIRED_SESSIONS = "DELETE FROM sessions WHERE last_activity < ?"
+SQL_SESSION_EXISTS = "SELECT 1 FROM sessions WHERE session_id = ?"
+SQL_INSERT_SESSION = (
+    "INSERT INTO sessions (session_id, creator_id, phase, created_at, last_activity) "
+    "VALUES (?, ?, 'adding', ?, ?)"
+)
+SQL_GET_SESSION = """
+    SELECT s.session_id, s.creator_id, s.phase, s.created_at, s.last_activity, s.result,
+        (SELECT json_group_array(value) FROM
+            (SELECT value FROM session_excluded WHERE session_id = s.session_id ORDER BY rowid)
+        ) AS "excluded_items [JSON]",
+        (SELECT json_group_array(member_id) FROM
+            (SELECT member_id FROM session_restart_votes WHERE session_id = s.session_id ORDER BY rowid)
+        ) AS "restart_votes [JSON]"
+    FROM sessions s WHERE s.session_id = ?
+"""
+SQL_TOUCH_SESSION = "UPDATE sessions SET last_activity = ? WHERE session_id = ?"
+SQL_SET_PHASE = "UPDATE sessions SET phase = ?, last_activity = ? WHERE session_id = ?"
+SQL_ADVANCE_PHASE = (
+    "UPDATE sessions SET phase = ?, last_activity = ? "
+    "WHERE session_id = ? AND phase = ? AND NOT EXISTS ("
+    "SELECT 1 FROM members WHERE members.session_id = sessions.session_id "
+    "AND is_observer = 0 AND is_ready = 0)"
+)
+SQL_SET_RESULT = "UPDATE sessions SET result = ? WHERE session_id = ?"
+SQL_GET_CREATOR = "SELECT creator_id FROM sessions WHERE session_id = ?"
+SQL_INSERT_MEMBER = (
+    "INSERT INTO members (session_id, member_id, is_observer, last_seen) VALUES (?, ?, ?, ?)"
+)
+# Member rows with their item lists aggregated back into JSON arrays.
+# The column order must match the Member fields.
+_SQL_SELECT_MEMBERS = """
+    SELECT m.member_id, m.is_ready, m.is_observer, m.last_seen,
+        (SELECT json_group_array(value) FROM
+            (SELECT value FROM member_items
+             WHERE session_id = m.session_id AND member_id = m.member_id ORDER BY idx)
+        ) AS "items [JSON]",
+        (SELECT json_group_array(value) FROM
+            (SELECT value FROM member_accepted
+             WHERE session_id = m.session_id AND member_id = m.member_id ORDER BY rowid)
+        ) AS "accepted_items [JSON]"
+    FROM members m
+"""
+SQL_GET_MEMBER = _SQL_SELECT_MEMBERS + "WHERE m.session_id = ? AND m.member_id = ?"
+SQL_GET_ALL_MEMBERS = _SQL_SELECT_MEMBERS + "WHERE m.session_id = ? ORDER BY m.id"
+SQL_GET_ACTIVE_MEMBERS = (
+    _SQL_SELECT_MEMBERS + "WHERE m.session_id = ? AND m.is_observer = 0 ORDER BY m.id"
+)
+SQL_DELETE_MEMBER_ITEMS = "DELETE FROM member_items WHERE session_id = ? AND member_id = ?"
+SQL_INSERT_MEMBER_ITEM = (
+    "INSERT INTO member_items (session_id, member_id, idx, value) VALUES (?, ?, ?, ?)"
+)
+SQL_APPEND_MEMBER_ITEM = (
+    "INSERT INTO member_items (session_id, member_id, idx, value) "
+    "SELECT ?1, ?2, COALESCE(MAX(idx) + 1, 0), ?3 FROM member_items "
+    "WHERE session_id = ?1 AND member_id = ?2"
+)
+# Positions map onto idx order; gaps left by earlier deletes are fine
+SQL_DELETE_MEMBER_ITEM_AT = (
+    "DELETE FROM member_items WHERE session_id = ?1 AND member_id = ?2 AND idx = ("
+    "SELECT idx FROM member_items WHERE session_id = ?1 AND member_id = ?2 "
+    "ORDER BY idx LIMIT 1 OFFSET ?3)"
+)
+SQL_DELETE_MEMBER_ACCEPTED = "DELETE FROM member_accepted WHERE session_id = ? AND member_id = ?"
+SQL_INSERT_MEMBER_ACCEPTED = (
+    "INSERT OR IGNORE INTO member_accepted (session_id, member_id, value) VALUES (?, ?, ?)"
+)
+SQL_SET_MEMBER_READY = (
+    "UPDATE members SET is_ready = ?, last_seen = ? WHERE session_id = ? AND member_id = ?"
+)
+# time.time() as seen from inside SQLite, for the activity triggers
+_SQL_NOW = "((julianday('now') - 2440587.5) * 86400.0)"
+# Debounced heartbeats may arrive after a newer write, so never move last_seen back
+SQL_FLUSH_LAST_SEEN = (
+    "UPDATE members SET last_seen = MAX(last_seen, ?) WHERE session_id = ? AND member_id = ?"
+)
+SQL_RESET_READY = "UPDATE members SET is_ready = 0 WHERE session_id = ?"
+SQL_RESET_ACCEPTED = "DELETE FROM member_accepted WHERE session_id = ?"
+SQL_CLEAR_ITEMS = "DELETE FROM member_items WHERE session_id = ?"
+SQL_PROMOTE_OBSERVERS = "UPDATE members SET is_observer = 0 WHERE session_id = ?"
+SQL_RESET_MEMBERS = "UPDATE members SET is_ready = 0, is_observer = 0 WHERE session_id = ?"
+SQL_DELETE_MEMBER = "DELETE FROM members WHERE session_id = ? AND member_id = ?"
+SQL_GET_EXCLUDED = "SELECT value FROM session_excluded WHERE session_id = ? ORDER BY rowid"
+SQL_ADD_EXCLUDED = "INSERT OR IGNORE INTO session_excluded (session_id, value) VALUES (?, ?)"
+SQL_CLEAR_EXCLUDED = "DELETE FROM session_excluded WHERE session_id = ?"
+SQL_GET_RESTART_VOTES = (
+    "SELECT member_id FROM session_restart_votes WHERE session_id = ? ORDER BY rowid"
+)
+SQL_ADD_RESTART_VOTE = (
+    "INSERT OR IGNORE INTO session_restart_votes (session_id, member_id) VALUES (?, ?)"
+)
+SQL_CLEAR_RESTART_VOTES = "DELETE FROM session_restart_votes WHERE session_id = ?"
+SQL_DELETE_SESSION_MEMBERS = "DELETE FROM members WHERE session_id = ?"
+SQL_DELETE_SESSION = "DELETE FROM sessions WHERE session_id = ?"
+
+
+# A member row, in the column order of _SQL_SELECT_MEMBERS
+Member = namedtuple(
+    "Member",
+    ["member_id", "is_ready", "is_observer", "last_seen", "items", "accepted_items"]
+)
+
+
+_make_member = Member._make
+
+_schema_ready = threading.Event()
+
+# Fixed pool of reader connections plus one writer connection. SQLite allows
+# a single writer at a time, so serializing writes in-process avoids
+# SQLITE_BUSY retries while readers run concurrently under WAL.
+_read_pool = queue.Queue(maxsize=READ_POOL_SIZE)
+_read_pool_lock = threading.Lock()
+_read_pool_filled = False
+
+_write_conn = None
+_write_lock = threading.Lock()
+
+_write_queue = queue.Queue()
+_writer_thread = None
+_writer_start_lock = threading.Lock()
+
+# (session_id, member_id) -> pending heartbeat time / time of the last database write
+_last_seen_pending = {}
+_last_seen_written = {}
+_last_seen_lock = threading.Lock()
+_last_seen_flusher = None
+
+# journal_mode=WAL is persistent in the database file, so it only needs to be
+# set once per process; the other PRAGMAs are per-connection.
+_wal_enabled = False
+_wal_lock = threading.Lock()
+
+
+def _configure_connection(conn: sqlite3.Connection):
+    """Apply performance PRAGMAs to a freshly opened connection."""
+    global _wal_enabled
+    with _wal_lock:
+        if not _wal_enabled:
+            conn.execute("PRAGMA journal_mode=WAL")
+            _wal_enabled = True
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-64000")
+    conn.execute("PRAGMA mmap_size=268435456")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.execute("PRAGMA busy_timeout=5000")
+
+
+def _open_connection() -> sqlite3.Connection:
+    """Open a configured connection that may be shared between threads."""
+    conn = sqlite3.connect(
+        str(DATABASE_PATH),
+        check_same_thread=False,
+        isolation_level=None,
+        detect_types=sqlite3.PARSE_COLNAMES,
+        cached_statements=STATEMENT_CACHE_SIZE
+    )
+    conn.row_factory = sqlite3.Row
+    _configure_connection(conn)
+    return conn
 
 
 @contextmanager
-def get_cursor():
-    """Context manager for database cursor with auto-commit."""
-    conn = get_connection()
-    cursor = conn.cursor()
+def read_cursor():
+    """
+    Context manager lending a pooled connection for read-only queries.
+    Connections run in autocommit mode, so plain SELECTs need no commit.
+    """
+    global _read_pool_filled
+    if not _read_pool_filled:
+        with _read_pool_lock:
+            if not _read_pool_filled:
+                for _ in range(READ_POOL_SIZE):
+                    _read_pool.put(_open_connection())
+                _read_pool_filled = True
+
+    conn = _read_pool.get()
     try:
-        yield cursor
-        conn.commit()
-    except Exception:
-        conn.rollback()
-        raise
+        yield conn
     finally:
-        cursor.close()
+        _read_pool.put(conn)
+
+
+@contextmanager
+def write_cursor():
+    """
+    Context manager holding the single writer connection inside a
+    BEGIN IMMEDIATE transaction, committing on success.
+    """
+    global _write_conn
+    with _write_lock:
+        if _write_conn is None:
+            _write_conn = _open_connection()
+        conn = _write_conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+
+def _writer_loop():
+    """Drain the write queue, committing each batch in one transaction."""
+    while True:
+        batch = [_write_queue.get()]
+        # Take whatever queued up meanwhile, but never wait for more:
+        # every caller blocks on its own write
+        while len(batch) < WRITE_BATCH_SIZE:
+            try:
+                batch.append(_write_queue.get_nowait())
+            except queue.Empty:
+                break
+
+        results = []
+        try:
+            with write_cursor() as conn:
+                for statements, future in batch:
+                    # A failing job only fails its own caller, not the batch
+                    conn.execute("SAVEPOINT write_op")
+                    try:
+                        rowcount = 0
+                        for sql, params in statements:
+                            rowcount = conn.execute(sql, params).rowcount
+                    except Exception as e:
+                        # Not just sqlite3.Error: e.g. UnicodeEncodeError while binding
+                        conn.execute("ROLLBACK TO write_op")
+                        results.append((future, None, e))
+                    else:
+                        results.append((future, rowcount, None))
+                    conn.execute("RELEASE write_op")
+        except Exception as e:
+            # Fail the whole batch but keep the writer thread alive
+            results = [(future, None, e) for _, future in batch]
+
+        for future, rowcount, error in results:
+            if error is None:
+                future.set_result(rowcount)
+            else:
+                future.set_exception(error)
+
+
+def _submit_write(sql: str, params: tuple) -> int:
+    """Run a write on the writer thread and wait for it. Returns the rowcount."""
+    return _submit_writes([(sql, params)])
+
+
+def _submit_writes(statements: list) -> int:
+    """
+    Run several (sql, params) statements atomically on the writer thread.
+    Returns the rowcount of the last statement.
+    """
+    global _writer_thread
+    if _writer_thread is None:
+        with _writer_start_lock:
+            if _writer_thread is None:
+                _writer_thread = threading.Thread(target=_writer_loop, name="db-writer", daemon=True)
+                _writer_thread.start()
+
+    future = Future()
+    _write_queue.put((statements, future))
+    return future.result()
 
 
 def init_database():
-    """Initialize the database schema."""
-    with get_cursor() as cursor:
-        cursor.execute("""
+    """
+    Initialize the database schema. Call once at application startup.
+    Skips all DDL when the database is already at SCHEMA_VERSION.
+    """
+    if _schema_ready.is_set():
+        return
+
+    with write_cursor() as conn:
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+            _schema_ready.set()
+            return
+
+        conn.execute("""
             CREATE TABLE IF NOT EXISTS sessions (
                 session_id TEXT PRIMARY KEY,
                 creator_id TEXT NOT NULL,
                 phase TEXT NOT NULL DEFAULT 'adding',
                 created_at REAL NOT NULL,
                 last_activity REAL NOT NULL,
-                excluded_items TEXT DEFAULT '[]',
-                restart_votes TEXT DEFAULT '[]'
+                result TEXT
             )
         """)
 
-        cursor.execute("""
+        conn.execute("""
             CREATE TABLE IF NOT EXISTS members (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 session_id TEXT NOT NULL,
                 member_id TEXT NOT NULL,
-                items TEXT DEFAULT '[]',
                 is_ready INTEGER DEFAULT 0,
-                accepted_items TEXT DEFAULT '[]',
                 is_observer INTEGER DEFAULT 0,
                 last_seen REAL NOT NULL,
                 FOREIGN KEY (session_id) REFERENCES sessions(session_id) ON DELETE CASCADE,
@@ -70,43 +352,214 @@ def init_database():
             )
         """)
 
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_members_session ON members(session_id)
+        # List-valued data lives in child tables, so single-item changes are
+        # single-row writes instead of rewriting a JSON array
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS member_items (
+                session_id TEXT NOT NULL,
+                member_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                value TEXT NOT NULL,
+                PRIMARY KEY (session_id, member_id, idx),
+                FOREIGN KEY (session_id, member_id)
+                    REFERENCES members(session_id, member_id) ON DELETE CASCADE
+            )
         """)
 
-        cursor.execute("""
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS member_accepted (
+                session_id TEXT NOT NULL,
+                member_id TEXT NOT NULL,
+                value TEXT NOT NULL,
+                PRIMARY KEY (session_id, member_id, value),
+                FOREIGN KEY (session_id, member_id)
+                    REFERENCES members(session_id, member_id) ON DELETE CASCADE
+            )
+        """)
+
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS session_excluded (
+                session_id TEXT NOT NULL,
+                value TEXT NOT NULL,
+                PRIMARY KEY (session_id, value),
+                FOREIGN KEY (session_id) REFERENCES sessions(session_id) ON DELETE CASCADE
+            )
+        """)
+
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS session_restart_votes (
+                session_id TEXT NOT NULL,
+                member_id TEXT NOT NULL,
+                PRIMARY KEY (session_id, member_id),
+                FOREIGN KEY (session_id) REFERENCES sessions(session_id) ON DELETE CASCADE
+            )
+        """)
+
+        _migrate_json_columns(conn)
+        if "result" not in _column_names(conn, "sessions"):
+            conn.execute("ALTER TABLE sessions ADD COLUMN result TEXT")
+
+        # Covers per-member lookups and the per-session member scans; its
+        # session_id prefix makes a separate single-column index redundant.
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_members_session_member
+            ON members(session_id, member_id, is_observer, is_ready, last_seen)
+        """)
+
+        conn.execute("DROP INDEX IF EXISTS idx_members_session")
+
+        # Active-member scans (is_observer = 0) by session, already in join order
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_members_active ON members(session_id) WHERE is_observer = 0
+        """)
+
+        conn.execute("""
             CREATE INDEX IF NOT EXISTS idx_sessions_activity ON sessions(last_activity)
         """)
 
+        # The creator joins their own session in the same statement that creates it
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_sessions_insert_creator
+            AFTER INSERT ON sessions
+            BEGIN
+                INSERT INTO members (session_id, member_id, last_seen)
+                VALUES (NEW.session_id, NEW.creator_id, NEW.created_at);
+            END
+        """)
+
+        # Member mutations count as session activity. Touching the session row
+        # from a trigger keeps member writes a single statement.
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_members_insert_activity
+            AFTER INSERT ON members
+            BEGIN
+                UPDATE sessions SET last_activity = NEW.last_seen WHERE session_id = NEW.session_id;
+            END
+        """)
+
+        # Only fire for writes that also bump last_seen, so bulk resets and
+        # plain heartbeats (update_member_last_seen) don't count as activity.
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_members_update_activity
+            AFTER UPDATE OF is_ready ON members
+            WHEN NEW.last_seen <> OLD.last_seen
+            BEGIN
+                UPDATE sessions SET last_activity = NEW.last_seen WHERE session_id = NEW.session_id;
+            END
+        """)
+
+        # Item and acceptance rows touch their member and session the same way,
+        # so list writes need no extra last_seen/last_activity statements
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_member_items_insert_activity
+            AFTER INSERT ON member_items
+            BEGIN
+                UPDATE members SET last_seen = {_SQL_NOW}
+                WHERE session_id = NEW.session_id AND member_id = NEW.member_id;
+                UPDATE sessions SET last_activity = {_SQL_NOW} WHERE session_id = NEW.session_id;
+            END
+        """)
+
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_member_items_delete_activity
+            AFTER DELETE ON member_items
+            BEGIN
+                UPDATE members SET last_seen = {_SQL_NOW}
+                WHERE session_id = OLD.session_id AND member_id = OLD.member_id;
+                UPDATE sessions SET last_activity = {_SQL_NOW} WHERE session_id = OLD.session_id;
+            END
+        """)
+
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_member_accepted_insert_activity
+            AFTER INSERT ON member_accepted
+            BEGIN
+                UPDATE members SET last_seen = {_SQL_NOW}
+                WHERE session_id = NEW.session_id AND member_id = NEW.member_id;
+                UPDATE sessions SET last_activity = {_SQL_NOW} WHERE session_id = NEW.session_id;
+            END
+        """)
+
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_member_accepted_delete_activity
+            AFTER DELETE ON member_accepted
+            BEGIN
+                UPDATE members SET last_seen = {_SQL_NOW}
+                WHERE session_id = OLD.session_id AND member_id = OLD.member_id;
+                UPDATE sessions SET last_activity = {_SQL_NOW} WHERE session_id = OLD.session_id;
+            END
+        """)
 
-def cleanup_expired_sessions():
-    """Remove sessions that have been inactive for more than 7 days."""
+        # Give the planner statistics for the new schema and indexes
+        conn.execute("ANALYZE")
+
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    _schema_ready.set()
+
+
+def _column_names(conn: sqlite3.Connection, table: str) -> set:
+    """Get the column names of a table."""
+    return {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def _migrate_json_columns(conn: sqlite3.Connection):
+    """Move list data from the old JSON columns into the child tables."""
+    if "items" in _column_names(conn, "members"):
+        conn.execute("""
+            INSERT OR IGNORE INTO member_items (session_id, member_id, idx, value)
+            SELECT m.session_id, m.member_id, j.key, j.value FROM members m, json_each(m.items) j
+        """)
+        conn.execute("""
+            INSERT OR IGNORE INTO member_accepted (session_id, member_id, value)
+            SELECT m.session_id, m.member_id, j.value FROM members m, json_each(m.accepted_items) j
+        """)
+        # The old update trigger references the dropped columns
+        conn.execute("DROP TRIGGER IF EXISTS trg_members_update_activity")
+        conn.execute("ALTER TABLE members DROP COLUMN items")
+        conn.execute("ALTER TABLE members DROP COLUMN accepted_items")
+
+    if "excluded_items" in _column_names(conn, "sessions"):
+        conn.execute("""
+            INSERT OR IGNORE INTO session_excluded (session_id, value)
+            SELECT s.session_id, j.value FROM sessions s, json_each(s.excluded_items) j
+        """)
+        conn.execute("""
+            INSERT OR IGNORE INTO session_restart_votes (session_id, member_id)
+            SELECT s.session_id, j.value FROM sessions s, json_each(s.restart_votes) j
+        """)
+        conn.execute("ALTER TABLE sessions DROP COLUMN excluded_items")
+        conn.execute("ALTER TABLE sessions DROP COLUMN restart_votes")
+
+
+def cleanup_expired_sessions() -> int:
+    """Remove sessions that have been inactive for more than 7 days. Returns the number removed."""
     cutoff = time.time() - SESSION_EXPIRY_SECONDS
-    with get_cursor() as cursor:
-        cursor.execute("DELETE FROM members WHERE session_id IN (SELECT session_id FROM sessions WHERE last_activity < ?)", (cutoff,))
-        cursor.execute("DELETE FROM sessions WHERE last_activity < ?", (cutoff,))
+    # Members go with their session via ON DELETE CASCADE
+    with write_cursor() as conn:
+        removed = conn.execute(SQL_DELETE_EXPIRED_SESSIONS, (cutoff,)).rowcount
+        if removed:
+            # Refresh statistics after mass deletes
+            for table in ANALYZED_TABLES:
+                conn.execute(f"ANALYZE {table}")
+    with _write_lock:
+        _write_conn.execute("PRAGMA optimize")
+    return removed
 
 
 def session_exists(session_id: str) -> bool:
     """Check if a session exists."""
-    with get_cursor() as cursor:
-        cursor.execute("SELECT 1 FROM sessions WHERE session_id = ?", (session_id,))
-        return cursor.fetchone() is not None
+    with read_cursor() as conn:
+        return conn.execute(SQL_SESSION_EXISTS, (session_id,)).fetchone() is not None
 
 
 def create_session(session_id: str, creator_id: str) -> bool:
     """Create a new session. Returns True if successful."""
     now = time.time()
     try:
-        with get_cursor() as cursor:
-            cursor.execute(
-                "INSERT INTO sessions (session_id, creator_id, phase, created_at, last_activity) VALUES (?, ?, 'adding', ?, ?)",
-                (session_id, creator_id, now, now)
-            )
-            cursor.execute(
-                "INSERT INTO members (session_id, member_id, last_seen) VALUES (?, ?, ?)",
-                (session_id, creator_id, now)
-            )
+        with write_cursor() as conn:
+            # trg_sessions_insert_creator adds the creator as the first member
+            conn.execute(SQL_INSERT_SESSION, (session_id, creator_id, now, now))
         return True
     except sqlite3.IntegrityError:
         return False
@@ -114,260 +567,316 @@ def create_session(session_id: str, creator_id: str) -> bool:
 
 def get_session(session_id: str) -> Optional[dict]:
     """Get session data."""
-    with get_cursor() as cursor:
-        cursor.execute("SELECT * FROM sessions WHERE session_id = ?", (session_id,))
-        row = cursor.fetchone()
-        if row:
-            return {
-                "session_id": row["session_id"],
-                "creator_id": row["creator_id"],
-                "phase": row["phase"],
-                "created_at": row["created_at"],
-                "last_activity": row["last_activity"],
-                "excluded_items": json.loads(row["excluded_items"]),
-                "restart_votes": json.loads(row["restart_votes"])
-            }
-    return None
+    with read_cursor() as conn:
+        row = conn.execute(SQL_GET_SESSION, (session_id,)).fetchone()
+    return _session_from_row(row) if row else None
+
+
+def _session_from_row(row: sqlite3.Row) -> dict:
+    """Build the session dict returned by get_session."""
+    return {
+        "session_id": row["session_id"],
+        "creator_id": row["creator_id"],
+        "phase": row["phase"],
+        "created_at": row["created_at"],
+        "last_activity": row["last_activity"],
+        "result": row["result"],
+        "excluded_items": row["excluded_items"],
+        "restart_votes": row["restart_votes"]
+    }
 
 
 def update_session_activity(session_id: str):
     """Update the last activity timestamp."""
-    with get_cursor() as cursor:
-        cursor.execute(
-            "UPDATE sessions SET last_activity = ? WHERE session_id = ?",
-            (time.time(), session_id)
-        )
+    _submit_write(SQL_TOUCH_SESSION, (time.time(), session_id))
 
 
 def set_session_phase(session_id: str, phase: str):
     """Set the session phase."""
-    with get_cursor() as cursor:
-        cursor.execute(
-            "UPDATE sessions SET phase = ?, last_activity = ? WHERE session_id = ?",
-            (phase, time.time(), session_id)
-        )
+    with write_cursor() as conn:
+        conn.execute(SQL_SET_PHASE, (phase, time.time(), session_id))
+
+
+def advance_session_phase(session_id: str, from_phase: str, to_phase: str,
+                          reset_ready: bool = False) -> bool:
+    """
+    Move a session from one phase to the next if it is still in from_phase
+    and every active member is ready. Returns True only for the caller that
+    performed the transition.
+    """
+    with write_cursor() as conn:
+        advanced = conn.execute(
+            SQL_ADVANCE_PHASE, (to_phase, time.time(), session_id, from_phase)
+        ).rowcount == 1
+        if advanced and reset_ready:
+            conn.execute(SQL_RESET_READY, (session_id,))
+    return advanced
+
+
+def set_session_result(session_id: str, result: Optional[str]):
+    """Store the currently selected result of a session."""
+    _submit_write(SQL_SET_RESULT, (result, session_id))
 
 
 def get_session_creator(session_id: str) -> Optional[str]:
     """Get the creator ID of a session."""
-    with get_cursor() as cursor:
-        cursor.execute("SELECT creator_id FROM sessions WHERE session_id = ?", (session_id,))
-        row = cursor.fetchone()
-        return row["creator_id"] if row else None
+    with read_cursor() as conn:
+        row = conn.execute(SQL_GET_CREATOR, (session_id,)).fetchone()
+    return row["creator_id"] if row else None
 
 
 def add_member(session_id: str, member_id: str, is_observer: bool = False) -> bool:
     """Add a member to a session. Returns True if successful."""
     now = time.time()
     try:
-        with get_cursor() as cursor:
-            cursor.execute(
-                "INSERT INTO members (session_id, member_id, is_observer, last_seen) VALUES (?, ?, ?, ?)",
-                (session_id, member_id, 1 if is_observer else 0, now)
-            )
-            cursor.execute(
-                "UPDATE sessions SET last_activity = ? WHERE session_id = ?",
-                (now, session_id)
-            )
+        with write_cursor() as conn:
+            conn.execute(SQL_INSERT_MEMBER, (session_id, member_id, 1 if is_observer else 0, now))
         return True
     except sqlite3.IntegrityError:
         return False
 
 
-def get_member(session_id: str, member_id: str) -> Optional[dict]:
+def get_member(session_id: str, member_id: str) -> Optional[Member]:
     """Get member data."""
-    with get_cursor() as cursor:
-        cursor.execute(
-            "SELECT * FROM members WHERE session_id = ? AND member_id = ?",
-            (session_id, member_id)
-        )
-        row = cursor.fetchone()
-        if row:
-            return {
-                "member_id": row["member_id"],
-                "items": json.loads(row["items"]),
-                "is_ready": bool(row["is_ready"]),
-                "accepted_items": json.loads(row["accepted_items"]),
-                "is_observer": bool(row["is_observer"]),
-                "last_seen": row["last_seen"]
-            }
-    return None
+    with read_cursor() as conn:
+        cur = conn.execute(SQL_GET_MEMBER, (session_id, member_id))
+        cur.row_factory = None
+        row = cur.fetchone()
+    return _make_member(row) if row else None
 
 
 def get_all_members(session_id: str) -> list:
     """Get all members in a session."""
-    with get_cursor() as cursor:
-        cursor.execute("SELECT * FROM members WHERE session_id = ?", (session_id,))
-        rows = cursor.fetchall()
-        return [
-            {
-                "member_id": row["member_id"],
-                "items": json.loads(row["items"]),
-                "is_ready": bool(row["is_ready"]),
-                "accepted_items": json.loads(row["accepted_items"]),
-                "is_observer": bool(row["is_observer"]),
-                "last_seen": row["last_seen"]
-            }
-            for row in rows
-        ]
+    with read_cursor() as conn:
+        cur = conn.execute(SQL_GET_ALL_MEMBERS, (session_id,))
+        # Plain tuples map straight onto Member without per-column lookups
+        cur.row_factory = None
+        rows = cur.fetchall()
+    return list(map(_make_member, rows))
 
 
 def get_active_members(session_id: str) -> list:
     """Get all non-observer members in a session."""
-    members = get_all_members(session_id)
-    return [m for m in members if not m["is_observer"]]
+    with read_cursor() as conn:
+        cur = conn.execute(SQL_GET_ACTIVE_MEMBERS, (session_id,))
+        cur.row_factory = None
+        rows = cur.fetchall()
+    return list(map(_make_member, rows))
+
+
+def get_session_snapshot(session_id: str) -> Optional[tuple]:
+    """
+    Read a session and all its members (observers included) in one read
+    transaction. Returns (session, members, restart_votes, excluded_items),
+    or None if the session does not exist.
+    """
+    with read_cursor() as conn:
+        conn.execute("BEGIN")
+        try:
+            row = conn.execute(SQL_GET_SESSION, (session_id,)).fetchone()
+            if not row:
+                return None
+            cur = conn.execute(SQL_GET_ALL_MEMBERS, (session_id,))
+            cur.row_factory = None
+            rows = cur.fetchall()
+        finally:
+            conn.execute("COMMIT")
+    session = _session_from_row(row)
+    members = list(map(_make_member, rows))
+    return session, members, session["restart_votes"], session["excluded_items"]
 
 
 def update_member_items(session_id: str, member_id: str, items: list):
     """Update a member's items."""
-    with get_cursor() as cursor:
-        cursor.execute(
-            "UPDATE members SET items = ?, last_seen = ? WHERE session_id = ? AND member_id = ?",
-            (json.dumps(items), time.time(), session_id, member_id)
-        )
-        cursor.execute(
-            "UPDATE sessions SET last_activity = ? WHERE session_id = ?",
-            (time.time(), session_id)
-        )
+    _submit_writes([
+        (SQL_DELETE_MEMBER_ITEMS, (session_id, member_id)),
+        *((SQL_INSERT_MEMBER_ITEM, (session_id, member_id, idx, item)) for idx, item in enumerate(items))
+    ])
+
+
+def append_member_item(session_id: str, member_id: str, item: str):
+    """Append one item to the end of a member's list."""
+    _submit_write(SQL_APPEND_MEMBER_ITEM, (session_id, member_id, item))
+
+
+def delete_member_item_at(session_id: str, member_id: str, index: int) -> bool:
+    """Delete the item at a position in a member's list. Returns True if one was removed."""
+    return _submit_write(SQL_DELETE_MEMBER_ITEM_AT, (session_id, member_id, index)) == 1
 
 
 def set_member_ready(session_id: str, member_id: str, is_ready: bool):
     """Set a member's ready status."""
-    with get_cursor() as cursor:
-        cursor.execute(
-            "UPDATE members SET is_ready = ?, last_seen = ? WHERE session_id = ? AND member_id = ?",
-            (1 if is_ready else 0, time.time(), session_id, member_id)
-        )
-        cursor.execute(
-            "UPDATE sessions SET last_activity = ? WHERE session_id = ?",
-            (time.time(), session_id)
-        )
+    _submit_write(SQL_SET_MEMBER_READY, (1 if is_ready else 0, time.time(), session_id, member_id))
+
+
+def batch_set_members_ready(session_id: str, member_ids: list, is_ready: bool):
+    """Set the ready status of several members in one transaction."""
+    if not member_ids:
+        return
+    params = (1 if is_ready else 0, time.time())
+    _submit_writes([
+        (SQL_SET_MEMBER_READY, (*params, session_id, member_id)) for member_id in member_ids
+    ])
 
 
 def update_member_accepted_items(session_id: str, member_id: str, accepted_items: list):
     """Update a member's accepted items."""
-    with get_cursor() as cursor:
-        cursor.execute(
-            "UPDATE members SET accepted_items = ?, last_seen = ? WHERE session_id = ? AND member_id = ?",
-            (json.dumps(accepted_items), time.time(), session_id, member_id)
-        )
-        cursor.execute(
-            "UPDATE sessions SET last_activity = ? WHERE session_id = ?",
-            (time.time(), session_id)
-        )
+    _submit_writes([
+        (SQL_DELETE_MEMBER_ACCEPTED, (session_id, member_id)),
+        *((SQL_INSERT_MEMBER_ACCEPTED, (session_id, member_id, item)) for item in accepted_items)
+    ])
 
 
 def update_member_last_seen(session_id: str, member_id: str):
-    """Update a member's last seen timestamp."""
-    with get_cursor() as cursor:
-        cursor.execute(
-            "UPDATE members SET last_seen = ? WHERE session_id = ? AND member_id = ?",
-            (time.time(), session_id, member_id)
-        )
+    """
+    Update a member's last seen timestamp.
+    Writes through if the member wasn't written in the last LAST_SEEN_DEBOUNCE
+    seconds; otherwise the heartbeat is buffered and flushed in the background.
+    """
+    global _last_seen_flusher
+    now = time.time()
+    key = (session_id, member_id)
+    with _last_seen_lock:
+        if now - _last_seen_written.get(key, 0) < LAST_SEEN_DEBOUNCE:
+            _last_seen_pending[key] = now
+            if _last_seen_flusher is None:
+                _last_seen_flusher = threading.Thread(
+                    target=_last_seen_flush_loop, name="db-last-seen", daemon=True
+                )
+                _last_seen_flusher.start()
+            return
+        _last_seen_written[key] = now
+    _submit_write(SQL_FLUSH_LAST_SEEN, (now, session_id, member_id))
+
+
+def flush_last_seen():
+    """Write all buffered heartbeats to the database."""
+    now = time.time()
+    with _last_seen_lock:
+        pending = [
+            (seen, session_id, member_id)
+            for (session_id, member_id), seen in _last_seen_pending.items()
+        ]
+        _last_seen_pending.clear()
+        # Members not written within the window write through on their next heartbeat anyway
+        for key in [key for key, written in _last_seen_written.items() if now - written >= LAST_SEEN_DEBOUNCE]:
+            del _last_seen_written[key]
+        for _, session_id, member_id in pending:
+            _last_seen_written[(session_id, member_id)] = now
+
+    if pending:
+        with write_cursor() as conn:
+            conn.executemany(SQL_FLUSH_LAST_SEEN, pending)
+
+
+def _last_seen_flush_loop():
+    """Periodically flush buffered heartbeats."""
+    while True:
+        time.sleep(LAST_SEEN_DEBOUNCE)
+        flush_last_seen()
+
+
+def _shutdown():
+    """Flush buffered heartbeats and let SQLite refresh stale statistics."""
+    flush_last_seen()
+    if _write_conn is not None:
+        with _write_lock:
+            _write_conn.execute("PRAGMA optimize")
+
+
+atexit.register(_shutdown)
 
 
 def reset_all_ready_status(session_id: str):
     """Reset all members' ready status to False."""
-    with get_cursor() as cursor:
-        cursor.execute(
-            "UPDATE members SET is_ready = 0 WHERE session_id = ?",
-            (session_id,)
-        )
+    with write_cursor() as conn:
+        conn.execute(SQL_RESET_READY, (session_id,))
 
 
 def reset_all_accepted_items(session_id: str):
     """Reset all members' accepted items."""
-    with get_cursor() as cursor:
-        cursor.execute(
-            "UPDATE members SET accepted_items = '[]' WHERE session_id = ?",
-            (session_id,)
-        )
+    with write_cursor() as conn:
+        conn.execute(SQL_RESET_ACCEPTED, (session_id,))
 
 
 def clear_all_items(session_id: str):
     """Clear all members' items."""
-    with get_cursor() as cursor:
-        cursor.execute(
-            "UPDATE members SET items = '[]' WHERE session_id = ?",
-            (session_id,)
-        )
+    with write_cursor() as conn:
+        conn.execute(SQL_CLEAR_ITEMS, (session_id,))
+
+
+def reset_session_state(session_id: str, phase: str):
+    """
+    Reset a session for a new round in one transaction.
+    Clears all items, acceptances, exclusions, restart votes and the
+    selected result, resets ready status, promotes observers and moves the
+    session to the given phase.
+    """
+    with write_cursor() as conn:
+        conn.execute(SQL_CLEAR_ITEMS, (session_id,))
+        conn.execute(SQL_RESET_ACCEPTED, (session_id,))
+        conn.execute(SQL_RESET_MEMBERS, (session_id,))
+        conn.execute(SQL_CLEAR_EXCLUDED, (session_id,))
+        conn.execute(SQL_CLEAR_RESTART_VOTES, (session_id,))
+        conn.execute(SQL_SET_RESULT, (None, session_id))
+        conn.execute(SQL_SET_PHASE, (phase, time.time(), session_id))
 
 
 def promote_observers(session_id: str):
     """Promote all observers to active members."""
-    with get_cursor() as cursor:
-        cursor.execute(
-            "UPDATE members SET is_observer = 0 WHERE session_id = ?",
-            (session_id,)
-        )
+    with write_cursor() as conn:
+        conn.execute(SQL_PROMOTE_OBSERVERS, (session_id,))
 
 
 def remove_member(session_id: str, member_id: str):
     """Remove a member from a session."""
-    with get_cursor() as cursor:
-        cursor.execute(
-            "DELETE FROM members WHERE session_id = ? AND member_id = ?",
-            (session_id, member_id)
-        )
+    with write_cursor() as conn:
+        conn.execute(SQL_DELETE_MEMBER, (session_id, member_id))
 
 
 def get_excluded_items(session_id: str) -> list:
     """Get the list of excluded items (for roll-next)."""
-    with get_cursor() as cursor:
-        cursor.execute("SELECT excluded_items FROM sessions WHERE session_id = ?", (session_id,))
-        row = cursor.fetchone()
-        return json.loads(row["excluded_items"]) if row else []
+    with read_cursor() as conn:
+        return [row["value"] for row in conn.execute(SQL_GET_EXCLUDED, (session_id,))]
 
 
 def set_excluded_items(session_id: str, excluded_items: list):
     """Set the list of excluded items."""
-    with get_cursor() as cursor:
-        cursor.execute(
-            "UPDATE sessions SET excluded_items = ? WHERE session_id = ?",
-            (json.dumps(excluded_items), session_id)
-        )
+    with write_cursor() as conn:
+        conn.execute(SQL_CLEAR_EXCLUDED, (session_id,))
+        conn.executemany(SQL_ADD_EXCLUDED, [(session_id, item) for item in excluded_items])
+
+
+def add_excluded_item(session_id: str, item: str):
+    """Append an item to the excluded list unless it is already in it."""
+    _submit_write(SQL_ADD_EXCLUDED, (session_id, item))
 
 
 def clear_excluded_items(session_id: str):
     """Clear the excluded items list."""
-    set_excluded_items(session_id, [])
+    with write_cursor() as conn:
+        conn.execute(SQL_CLEAR_EXCLUDED, (session_id,))
 
 
 def get_restart_votes(session_id: str) -> list:
     """Get the list of member IDs who voted to restart."""
-    with get_cursor() as cursor:
-        cursor.execute("SELECT restart_votes FROM sessions WHERE session_id = ?", (session_id,))
-        row = cursor.fetchone()
-        return json.loads(row["restart_votes"]) if row else []
+    with read_cursor() as conn:
+        return [row["member_id"] for row in conn.execute(SQL_GET_RESTART_VOTES, (session_id,))]
 
 
 def add_restart_vote(session_id: str, member_id: str):
-    """Add a restart vote from a member."""
-    votes = get_restart_votes(session_id)
-    if member_id not in votes:
-        votes.append(member_id)
-        with get_cursor() as cursor:
-            cursor.execute(
-                "UPDATE sessions SET restart_votes = ? WHERE session_id = ?",
-                (json.dumps(votes), session_id)
-            )
+    """Add a restart vote from a member (no-op if they already voted)."""
+    _submit_write(SQL_ADD_RESTART_VOTE, (session_id, member_id))
 
 
 def clear_restart_votes(session_id: str):
     """Clear all restart votes."""
-    with get_cursor() as cursor:
-        cursor.execute(
-            "UPDATE sessions SET restart_votes = '[]' WHERE session_id = ?",
-            (session_id,)
-        )
+    with write_cursor() as conn:
+        conn.execute(SQL_CLEAR_RESTART_VOTES, (session_id,))
 
 
 def delete_session(session_id: str):
     """Delete a session and all its members."""
-    with get_cursor() as cursor:
-        cursor.execute("DELETE FROM members WHERE session_id = ?", (session_id,))
-        cursor.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
-
-
-# Initialize database on module load
-init_database()
+    with write_cursor() as conn:
+        conn.execute(SQL_DELETE_SESSION_MEMBERS, (session_id,))
+        conn.execute(SQL_DELETE_SESSION, (session_id,))
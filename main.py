@@ -3,8 +3,9 @@ Wir können uns nicht entscheiden - Group Decision Making App
 """
 
 import flet as ft
-import base64
 import asyncio
+import threading
+import time
 import session as sess
 import database as db
 
@@ -13,6 +14,54 @@ STORAGE_PREFIX = "wkune."
 STORAGE_MEMBER_ID = f"{STORAGE_PREFIX}member_id"
 STORAGE_SESSION_ID = f"{STORAGE_PREFIX}session_id"
 
+# Pubsub refresh coalescing (seconds)
+REFRESH_DEBOUNCE_MIN = 0.05
+REFRESH_DEBOUNCE_MAX = 1.0
+
+# Session state cache lifetime and last_seen heartbeat interval (seconds)
+STATE_CACHE_TTL = 0.1
+LAST_SEEN_INTERVAL = 5.0
+
+# Idle clients still heartbeat this often, well inside the creator timeout
+HEARTBEAT_INTERVAL = 15.0
+
+# Quiet period before checkbox changes are written (seconds)
+ACCEPT_SAVE_DELAY = 0.3
+
+# Expired-session sweep interval bounds (seconds)
+CLEANUP_INTERVAL_MIN = 30.0
+CLEANUP_INTERVAL_MAX = 300.0
+
+_cleanup_started = False
+_cleanup_lock = threading.Lock()
+
+
+def _cleanup_loop():
+    """Sweep expired sessions, backing off while there is nothing to remove."""
+    interval = CLEANUP_INTERVAL_MIN
+    while True:
+        try:
+            removed = db.cleanup_expired_sessions()
+        except Exception:
+            # Keep the sweeper alive; the next pass retries
+            removed = 0
+        if removed:
+            sess.clear_session_indexes()
+            interval = CLEANUP_INTERVAL_MIN
+        else:
+            interval = min(interval * 2, CLEANUP_INTERVAL_MAX)
+        time.sleep(interval)
+
+
+def start_cleanup_thread():
+    """Start the background session sweeper once per process."""
+    global _cleanup_started
+    with _cleanup_lock:
+        if _cleanup_started:
+            return
+        _cleanup_started = True
+    threading.Thread(target=_cleanup_loop, name="session-cleanup", daemon=True).start()
+
 
 async def main(page: ft.Page):
     page.title = "Wir können uns nicht entscheiden"
@@ -20,16 +69,33 @@ async def main(page: ft.Page):
     page.spacing = 10
 
     # Responsive width
-    def get_content_width():
+    def compute_content_width():
         if page.width and page.width < 600:
             return page.width - 40
         return 500
 
+    content_width = None  # width last handed to the current view
+    width_controls = []  # controls in the current view sized by content_width
+
+    def get_content_width():
+        nonlocal content_width
+        content_width = compute_content_width()
+        return content_width
+
     # State variables
     current_session_id = None
     current_member_id = None
     selected_result = None
     accepted_items_set = set()
+    refresh_pending = False
+    refresh_delay = REFRESH_DEBOUNCE_MIN
+    rendered_view = None  # (phase, is_observer) currently on screen
+    state_cache = {"key": None, "ts": 0.0, "value": None}
+    last_seen_sent = 0.0
+    page_closed = False
+    accept_save_timer = None
+    accept_save_lock = threading.Lock()
+    accept_write_lock = threading.Lock()  # held while a save is being written
 
     # Theme handling
     page.theme_mode = ft.ThemeMode.SYSTEM
@@ -40,6 +106,7 @@ async def main(page: ft.Page):
         else:
             page.theme_mode = ft.ThemeMode.LIGHT
         theme_btn.icon = ft.Icons.LIGHT_MODE if page.theme_mode == ft.ThemeMode.DARK else ft.Icons.DARK_MODE
+        # theme_mode is a page property, so this one needs the page-level update
         page.update()
 
     theme_btn = ft.IconButton(
@@ -79,6 +146,17 @@ async def main(page: ft.Page):
         alignment=ft.MainAxisAlignment.SPACE_BETWEEN
     )
 
+    # Ready counter shared by the adding and accepting phases
+    ready_status = ft.Text("", size=14, color=ft.Colors.GREY)
+
+    # Result line, updated in place when a new result is rolled
+    result_text = ft.Text(
+        "",
+        size=28,
+        weight=ft.FontWeight.BOLD,
+        text_align=ft.TextAlign.CENTER
+    )
+
     # Main content container
     content = ft.Column(
         [],
@@ -87,32 +165,137 @@ async def main(page: ft.Page):
         expand=True
     )
 
-    # Snackbar for messages
+    # Snackbar for messages, created once and reused
+    snack_text = ft.Text("")
+    snack_bar = ft.SnackBar(content=snack_text)
+    page.overlay.append(snack_bar)
+
     def show_message(msg: str, is_error: bool = False):
-        page.snack_bar = ft.SnackBar(
-            content=ft.Text(msg),
-            bgcolor=ft.Colors.RED_400 if is_error else ft.Colors.GREEN_400
-        )
-        page.snack_bar.open = True
-        page.update()
+        snack_text.value = msg
+        snack_bar.bgcolor = ft.Colors.RED_400 if is_error else ft.Colors.GREEN_400
+        snack_bar.open = True
+        page.update(snack_bar)
+
+    # Coalesce bursts of remote updates into a single refresh. The delay
+    # doubles while only remote messages arrive and resets on local actions.
+    def schedule_refresh():
+        nonlocal refresh_pending
+        if refresh_pending:
+            return
+        refresh_pending = True
+        page.run_task(debounced_refresh)
+
+    async def debounced_refresh():
+        nonlocal refresh_pending, refresh_delay
+        await asyncio.sleep(refresh_delay)
+        refresh_pending = False
+        refresh_delay = min(refresh_delay * 2, REFRESH_DEBOUNCE_MAX)
+        await refresh_ui()
+
+    def reset_refresh_backoff():
+        nonlocal refresh_delay
+        refresh_delay = REFRESH_DEBOUNCE_MIN
+        invalidate_state()
+
+    # Session state reads are memoized briefly so a burst of refreshes hits
+    # the database once. Local actions and incoming messages invalidate it.
+    def get_state():
+        key = (current_session_id, current_member_id)
+        now = time.monotonic()
+        if state_cache["key"] == key and now - state_cache["ts"] < STATE_CACHE_TTL:
+            return state_cache["value"]
+        state = sess.get_session_state(current_session_id, current_member_id)
+        state_cache.update(key=key, ts=now, value=state)
+        return state
 
-    # PubSub message handler
-    def on_pubsub_message(topic, msg):
+    def invalidate_state():
+        state_cache["ts"] = 0.0
+
+    # Heartbeat for auto-ready and creator_connected; also sent from pubsub
+    # messages and rerolls since those no longer re-render the session
+    def touch_last_seen():
+        nonlocal last_seen_sent
+        if not current_session_id:
+            return
+        now = time.monotonic()
+        if now - last_seen_sent >= LAST_SEEN_INTERVAL:
+            last_seen_sent = now
+            db.update_member_last_seen(current_session_id, current_member_id)
+
+    # Accepted items are written once the user pauses, not on every click
+    def save_accepted_items():
+        sess.set_accepted_items(current_session_id, current_member_id, list(accepted_items_set))
+
+    def schedule_accepted_save():
+        nonlocal accept_save_timer
+        with accept_save_lock:
+            if accept_save_timer:
+                accept_save_timer.cancel()
+            accept_save_timer = threading.Timer(ACCEPT_SAVE_DELAY, flush_accepted_save)
+            accept_save_timer.daemon = True
+            accept_save_timer.start()
+
+    # Also waits for a save the timer already started, so callers that
+    # flush before set_ready never race the last acceptances to the database
+    def flush_accepted_save():
+        nonlocal accept_save_timer
+        with accept_write_lock:
+            with accept_save_lock:
+                if accept_save_timer is None:
+                    return
+                accept_save_timer.cancel()
+                accept_save_timer = None
+            save_accepted_items()
+
+    # Dialogs join the overlay once; reopening only updates the dialog itself
+    def open_dialog(dialog):
+        dialog.open = True
+        if dialog in page.overlay:
+            page.update(dialog)
+        else:
+            page.overlay.append(dialog)
+            page.update()
+
+    # PubSub message handlers, looked up by action
+    def on_ready_delta(msg):
+        apply_ready_delta(msg["ready_count"], msg["total_members"])
+
+    def on_phase_changed(msg):
+        schedule_refresh()
+
+    def on_result_selected(msg):
         nonlocal selected_result
+        selected_result = msg.get("item")
+        if rendered_view == (sess.PHASE_RESULT, False):
+            result_text.value = selected_result or "No items available"
+            page.update(result_text)
+        else:
+            # Arriving from the accepting phase needs the result view built
+            schedule_refresh()
+
+    def on_restart_vote_update(msg):
+        schedule_refresh()
+
+    def on_session_reset(msg):
+        nonlocal selected_result
+        selected_result = None
+        schedule_refresh()
+
+    pubsub_handlers = {
+        "ready_delta": on_ready_delta,
+        "phase_changed": on_phase_changed,
+        "result_selected": on_result_selected,
+        "restart_vote_update": on_restart_vote_update,
+        "session_reset": on_session_reset,
+    }
+
+    def on_pubsub_message(topic, msg):
         if isinstance(msg, dict):
-            action = msg.get("action")
-            if action == "refresh":
-                page.run_task(refresh_ui)
-            elif action == "phase_changed":
-                page.run_task(refresh_ui)
-            elif action == "result_selected":
-                selected_result = msg.get("item")
-                page.run_task(refresh_ui)
-            elif action == "restart_vote_update":
-                page.run_task(refresh_ui)
-            elif action == "session_reset":
-                selected_result = None
-                page.run_task(refresh_ui)
+            invalidate_state()
+            touch_last_seen()
+            handler = pubsub_handlers.get(msg.get("action"))
+            if handler:
+                handler(msg)
 
     def subscribe_to_session(session_id: str):
         page.pubsub.subscribe_topic(session_id, on_pubsub_message)
@@ -125,9 +308,20 @@ async def main(page: ft.Page):
         if current_session_id:
             page.pubsub.send_all_on_topic(current_session_id, msg)
 
+    def broadcast_ready_delta(ready_count: int, total_members: int):
+        broadcast_to_session({
+            "action": "ready_delta",
+            "ready_count": ready_count,
+            "total_members": total_members
+        })
+
     # Landing page
     async def show_landing():
-        nonlocal current_session_id, current_member_id
+        nonlocal current_session_id, current_member_id, rendered_view
+        Icons, Colors, FW = ft.Icons, ft.Colors, ft.FontWeight
+
+        rendered_view = None
+        width_controls.clear()
 
         session_input = ft.TextField(
             label="Session Code",
@@ -169,29 +363,31 @@ async def main(page: ft.Page):
                 current_member_id = member_id
                 await page.shared_preferences.set(STORAGE_SESSION_ID, code)
                 subscribe_to_session(code)
-                broadcast_to_session({"action": "refresh"})
+                state = get_state()
+                if "error" not in state:
+                    broadcast_ready_delta(state["ready_count"], state["total_members"])
                 await show_session()
             else:
                 show_message(result.get("error", "Failed to join session"), True)
 
         content.controls = [
             ft.Container(height=50),
-            ft.Text("Group Decision Maker", size=28, weight=ft.FontWeight.BOLD),
-            ft.Text("Create a session or join an existing one", size=14, color=ft.Colors.GREY),
+            ft.Text("Group Decision Maker", size=28, weight=FW.BOLD),
+            ft.Text("Create a session or join an existing one", size=14, color=Colors.GREY),
             ft.Container(height=30),
             ft.ElevatedButton(
                 "Create New Session",
-                icon=ft.Icons.ADD,
+                icon=Icons.ADD,
                 on_click=create_session,
                 width=250
             ),
             ft.Container(height=20),
-            ft.Text("- or -", color=ft.Colors.GREY),
+            ft.Text("- or -", color=Colors.GREY),
             ft.Container(height=20),
             session_input,
             ft.ElevatedButton(
                 "Join Session",
-                icon=ft.Icons.LOGIN,
+                icon=Icons.LOGIN,
                 on_click=join_session,
                 width=250
             )
@@ -199,17 +395,21 @@ async def main(page: ft.Page):
 
         session_code_text.value = ""
         copy_code_btn.visible = False
-        page.update()
+        page.update(session_code_row, content)
 
     # Session view
     async def show_session():
-        nonlocal selected_result
+        nonlocal selected_result, rendered_view
+        width_controls.clear()
 
         if not current_session_id or not current_member_id:
             await show_landing()
             return
 
-        state = sess.get_session_state(current_session_id, current_member_id)
+        # Write pending checkbox changes so the state read below includes them
+        flush_accepted_save()
+
+        state = get_state()
         if "error" in state:
             await page.shared_preferences.remove(STORAGE_SESSION_ID)
             await show_landing()
@@ -220,32 +420,43 @@ async def main(page: ft.Page):
         copy_code_btn.visible = True
 
         # Update member's last seen
-        db.update_member_last_seen(current_session_id, current_member_id)
+        touch_last_seen()
 
         phase = state["phase"]
+        previous_view = rendered_view
+        rendered_view = (phase, state["is_observer"])
 
         if state["is_observer"]:
             await show_observer_view(state)
         elif phase == sess.PHASE_ADDING:
             await show_adding_phase(state)
         elif phase == sess.PHASE_ACCEPTING:
-            await show_accepting_phase(state)
+            await show_accepting_phase(state, entering=previous_view != rendered_view)
         elif phase == sess.PHASE_RESULT:
             await show_result_phase(state)
 
-        page.update()
+        page.update(session_code_row, content)
 
     async def refresh_ui():
         await show_session()
 
+    # Only the ready counter changes when someone toggles ready or joins
+    def apply_ready_delta(ready_count: int, total_members: int):
+        if rendered_view not in ((sess.PHASE_ADDING, False), (sess.PHASE_ACCEPTING, False)):
+            return
+        ready_status.value = f"{ready_count} of {total_members} ready"
+        page.update(ready_status)
+
     # Observer view
     async def show_observer_view(state):
+        Icons, Colors, FW = ft.Icons, ft.Colors, ft.FontWeight
+
         content.controls = [
             ft.Container(height=30),
-            ft.Icon(ft.Icons.VISIBILITY, size=50, color=ft.Colors.GREY),
-            ft.Text("Observer Mode", size=24, weight=ft.FontWeight.BOLD),
+            ft.Icon(Icons.VISIBILITY, size=50, color=Colors.GREY),
+            ft.Text("Observer Mode", size=24, weight=FW.BOLD),
             ft.Text("You joined while a session was in progress.", size=14),
-            ft.Text("You will be able to participate in the next round.", size=14, color=ft.Colors.GREY),
+            ft.Text("You will be able to participate in the next round.", size=14, color=Colors.GREY),
             ft.Container(height=20),
             ft.Text(f"Current phase: {state['phase'].title()}", size=14),
             ft.Container(height=30),
@@ -255,33 +466,35 @@ async def main(page: ft.Page):
     # Adding phase
     async def show_adding_phase(state):
         nonlocal accepted_items_set
+        Icons, Colors, FW = ft.Icons, ft.Colors, ft.FontWeight
+
         accepted_items_set = set()  # Reset for new round
 
         items_list = ft.ListView(spacing=5, height=200, auto_scroll=True)
 
-        def update_items_list():
-            items_list.controls = []
-            for i, item in enumerate(state["my_items"]):
-                items_list.controls.append(
-                    ft.Row([
-                        ft.Text(item, expand=True),
-                        ft.IconButton(
-                            icon=ft.Icons.DELETE,
-                            icon_color=ft.Colors.RED_400,
-                            tooltip="Remove",
-                            on_click=lambda e, idx=i: remove_item(idx),
-                            disabled=state["is_ready"]
-                        )
-                    ])
+        def make_item_row(item):
+            row = ft.Row([ft.Text(item, expand=True)])
+            row.controls.append(
+                ft.IconButton(
+                    icon=Icons.DELETE,
+                    icon_color=Colors.RED_400,
+                    tooltip="Remove",
+                    on_click=lambda e: remove_item(row),
+                    disabled=state["is_ready"]
                 )
-            page.update()
+            )
+            return row
 
-        def remove_item(idx):
+        def remove_item(row):
+            reset_refresh_backoff()
+            # Look the position up at click time so earlier removals don't shift it
+            idx = items_list.controls.index(row)
             result = sess.remove_item(current_session_id, current_member_id, idx)
             if result["success"]:
                 state["my_items"] = result["items"]
-                update_items_list()
-                broadcast_to_session({"action": "refresh"})
+                items_list.controls.pop(idx)
+                page.update(items_list)
+                # Don't broadcast - removing items only affects our own list
             else:
                 show_message(result.get("error", "Failed to remove item"), True)
 
@@ -296,129 +509,131 @@ async def main(page: ft.Page):
         async def add_item(e=None):
             if not item_input.value or not item_input.value.strip():
                 return
+            reset_refresh_backoff()
             result = sess.add_item(current_session_id, current_member_id, item_input.value)
             if result["success"]:
                 state["my_items"] = result["items"]
                 item_input.value = ""
-                update_items_list()
+                items_list.controls.append(make_item_row(result["items"][-1]))
+                page.update(items_list, item_input)
                 # Don't broadcast - adding items only affects our own list
             else:
                 show_message(result.get("error", "Failed to add item"), True)
-                page.update()
             await asyncio.sleep(0.1)
             await item_input.focus()
 
         item_input.on_submit = add_item
 
         add_btn = ft.IconButton(
-            icon=ft.Icons.ADD,
+            icon=Icons.ADD,
             on_click=add_item,
             disabled=state["is_ready"]
         )
 
         async def toggle_ready(e):
+            reset_refresh_backoff()
             new_ready = not state["is_ready"]
             result = sess.set_ready(current_session_id, current_member_id, new_ready)
             if result["success"]:
                 state["is_ready"] = new_ready
-                # Check if phase should advance
-                new_phase = sess.check_and_advance_phase(current_session_id)
-                if new_phase:
-                    broadcast_to_session({"action": "phase_changed", "phase": new_phase})
+                # Only the member whose ready completed the round advances it
+                if result["should_advance"]:
+                    broadcast_to_session({"action": "phase_changed", "phase": result["new_phase"]})
                 else:
-                    broadcast_to_session({"action": "refresh"})
+                    broadcast_ready_delta(result["ready_count"], result["total_members"])
                 await refresh_ui()
             else:
                 show_message(result.get("error", "Failed to update ready status"), True)
 
         ready_btn = ft.ElevatedButton(
             "Ready" if not state["is_ready"] else "Cancel Ready",
-            icon=ft.Icons.CHECK if not state["is_ready"] else ft.Icons.CLOSE,
+            icon=Icons.CHECK if not state["is_ready"] else Icons.CLOSE,
             on_click=toggle_ready,
-            bgcolor=ft.Colors.GREEN_400 if not state["is_ready"] else ft.Colors.ORANGE_400
+            bgcolor=Colors.GREEN_400 if not state["is_ready"] else Colors.ORANGE_400
         )
 
-        ready_status = ft.Text(
-            f"{state['ready_count']} of {state['total_members']} ready",
-            size=14,
-            color=ft.Colors.GREY
-        )
+        ready_status.value = f"{state['ready_count']} of {state['total_members']} ready"
 
-        update_items_list()
+        items_list.controls = [make_item_row(item) for item in state["my_items"]]
+
+        items_box = ft.Container(
+            content=items_list,
+            border=ft.border.all(1, Colors.GREY_400),
+            border_radius=8,
+            padding=10,
+            width=get_content_width()
+        )
+        ready_row = ft.Row(
+            [ready_btn, ready_status],
+            alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
+            width=get_content_width()
+        )
+        width_controls[:] = [items_box, ready_row]
 
         content.controls = [
-            ft.Text("Add Your Options", size=24, weight=ft.FontWeight.BOLD),
-            ft.Text("Enter items you'd like to suggest", size=14, color=ft.Colors.GREY),
+            ft.Text("Add Your Options", size=24, weight=FW.BOLD),
+            ft.Text("Enter items you'd like to suggest", size=14, color=Colors.GREY),
             ft.Container(height=10),
             ft.Row([item_input, add_btn]),
-            ft.Container(
-                content=items_list,
-                border=ft.border.all(1, ft.Colors.GREY_400),
-                border_radius=8,
-                padding=10,
-                width=get_content_width()
-            ),
+            items_box,
             ft.Container(height=10),
-            ft.Row(
-                [ready_btn, ready_status],
-                alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
-                width=get_content_width()
-            ),
+            ready_row,
             ft.Container(height=20),
             leave_session_button()
         ]
 
     # Accepting phase
-    async def show_accepting_phase(state):
+    async def show_accepting_phase(state, entering: bool = True):
         nonlocal accepted_items_set
+        Icons, Colors, FW = ft.Icons, ft.Colors, ft.FontWeight
 
         items_for_acceptance = sess.get_items_for_acceptance(current_session_id, current_member_id)
 
-        # Initialize accepted items from state
-        accepted_items_set = set(state["my_accepted_items"])
+        # Seed accepted items from state on phase entry only; afterwards the
+        # local set is the source of truth and the debounced save follows it
+        if entering:
+            accepted_items_set = set(state["my_accepted_items"])
 
         checkboxes = []
         checkbox_list = ft.ListView(spacing=5, height=250)
 
-        def on_checkbox_change(e, item):
+        # One handler for every checkbox; the item travels in control.data
+        def on_checkbox_change(e):
+            item = e.control.data
             if e.control.value:
                 accepted_items_set.add(item)
             else:
                 accepted_items_set.discard(item)
-            save_accepted_items()
-
-        def save_accepted_items():
-            sess.set_accepted_items(current_session_id, current_member_id, list(accepted_items_set))
+            schedule_accepted_save()
 
         def select_all(e):
             for cb in checkboxes:
                 cb.value = True
             accepted_items_set.clear()
             accepted_items_set.update(items_for_acceptance)
-            save_accepted_items()
-            page.update()
+            schedule_accepted_save()
+            page.update(checkbox_list)
 
         def clear_all(e):
             for cb in checkboxes:
                 cb.value = False
             accepted_items_set.clear()
-            save_accepted_items()
-            page.update()
+            schedule_accepted_save()
+            page.update(checkbox_list)
 
         def toggle_all(e):
+            accepted_items_set.symmetric_difference_update(items_for_acceptance)
             for cb in checkboxes:
-                cb.value = not cb.value
-            new_set = set(items_for_acceptance) - accepted_items_set
-            accepted_items_set.clear()
-            accepted_items_set.update(new_set)
-            save_accepted_items()
-            page.update()
+                cb.value = cb.data in accepted_items_set
+            schedule_accepted_save()
+            page.update(checkbox_list)
 
         for item in items_for_acceptance:
             cb = ft.Checkbox(
                 label=item,
                 value=item in accepted_items_set,
-                on_change=lambda e, i=item: on_checkbox_change(e, i),
+                data=item,
+                on_change=on_checkbox_change,
                 disabled=state["is_ready"]
             )
             checkboxes.append(cb)
@@ -431,61 +646,62 @@ async def main(page: ft.Page):
         ], alignment=ft.MainAxisAlignment.CENTER)
 
         async def toggle_ready(e):
+            reset_refresh_backoff()
+            flush_accepted_save()
             new_ready = not state["is_ready"]
             result = sess.set_ready(current_session_id, current_member_id, new_ready)
             if result["success"]:
                 state["is_ready"] = new_ready
-                # Check if phase should advance
-                new_phase = sess.check_and_advance_phase(current_session_id)
-                if new_phase:
+                # Only the member whose ready completed the round advances it
+                if result["should_advance"]:
                     # Select the result
                     result_item = sess.select_item(current_session_id)
                     broadcast_to_session({"action": "result_selected", "item": result_item})
                 else:
-                    broadcast_to_session({"action": "refresh"})
+                    broadcast_ready_delta(result["ready_count"], result["total_members"])
                 await refresh_ui()
             else:
                 show_message(result.get("error", "Failed to update ready status"), True)
 
         ready_btn = ft.ElevatedButton(
             "Ready" if not state["is_ready"] else "Cancel Ready",
-            icon=ft.Icons.CHECK if not state["is_ready"] else ft.Icons.CLOSE,
+            icon=Icons.CHECK if not state["is_ready"] else Icons.CLOSE,
             on_click=toggle_ready,
-            bgcolor=ft.Colors.GREEN_400 if not state["is_ready"] else ft.Colors.ORANGE_400
+            bgcolor=Colors.GREEN_400 if not state["is_ready"] else Colors.ORANGE_400
         )
 
-        ready_status = ft.Text(
-            f"{state['ready_count']} of {state['total_members']} ready",
-            size=14,
-            color=ft.Colors.GREY
-        )
+        ready_status.value = f"{state['ready_count']} of {state['total_members']} ready"
 
         no_items_text = ft.Text(
             "No items from other members to accept.",
-            color=ft.Colors.GREY,
+            color=Colors.GREY,
             visible=len(items_for_acceptance) == 0
         )
 
+        items_box = ft.Container(
+            content=checkbox_list if items_for_acceptance else no_items_text,
+            border=ft.border.all(1, Colors.GREY_400),
+            border_radius=8,
+            padding=10,
+            width=get_content_width(),
+            height=250 if items_for_acceptance else 50
+        )
+        ready_row = ft.Row(
+            [ready_btn, ready_status],
+            alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
+            width=get_content_width()
+        )
+        width_controls[:] = [items_box, ready_row]
+
         content.controls = [
-            ft.Text("Accept Options", size=24, weight=ft.FontWeight.BOLD),
-            ft.Text("Select which options you would accept", size=14, color=ft.Colors.GREY),
-            ft.Text("(Your own items are automatically accepted)", size=12, color=ft.Colors.GREY),
+            ft.Text("Accept Options", size=24, weight=FW.BOLD),
+            ft.Text("Select which options you would accept", size=14, color=Colors.GREY),
+            ft.Text("(Your own items are automatically accepted)", size=12, color=Colors.GREY),
             ft.Container(height=10),
             bulk_buttons if items_for_acceptance else ft.Container(),
-            ft.Container(
-                content=checkbox_list if items_for_acceptance else no_items_text,
-                border=ft.border.all(1, ft.Colors.GREY_400),
-                border_radius=8,
-                padding=10,
-                width=get_content_width(),
-                height=250 if items_for_acceptance else 50
-            ),
+            items_box,
             ft.Container(height=10),
-            ft.Row(
-                [ready_btn, ready_status],
-                alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
-                width=get_content_width()
-            ),
+            ready_row,
             ft.Container(height=20),
             leave_session_button()
         ]
@@ -493,41 +709,48 @@ async def main(page: ft.Page):
     # Result phase
     async def show_result_phase(state):
         nonlocal selected_result
+        Icons, Colors = ft.Icons, ft.Colors
 
+        # The member who completed the round picked and stored the result
         if not selected_result:
-            selected_result = sess.select_item(current_session_id)
+            selected_result = state["result"]
+        result_text.value = selected_result or "No items available"
 
         result_display = ft.Container(
             content=ft.Column([
-                ft.Icon(ft.Icons.CELEBRATION, size=40, color=ft.Colors.AMBER),
-                ft.Text("The result is:", size=16, color=ft.Colors.GREY),
-                ft.Text(
-                    selected_result or "No items available",
-                    size=28,
-                    weight=ft.FontWeight.BOLD,
-                    text_align=ft.TextAlign.CENTER
-                )
+                ft.Icon(Icons.CELEBRATION, size=40, color=Colors.AMBER),
+                ft.Text("The result is:", size=16, color=Colors.GREY),
+                result_text
             ], horizontal_alignment=ft.CrossAxisAlignment.CENTER, spacing=10),
             padding=30,
-            border=ft.border.all(2, ft.Colors.AMBER),
+            border=ft.border.all(2, Colors.AMBER),
             border_radius=16,
             width=get_content_width()
         )
+        width_controls[:] = [result_display]
 
         async def do_reroll(e):
             nonlocal selected_result
+            reset_refresh_backoff()
+            touch_last_seen()
             selected_result = sess.reroll(current_session_id)
+            # Our own pick is authoritative; show it without re-reading state
+            result_text.value = selected_result or "No items available"
+            page.update(result_text)
             broadcast_to_session({"action": "result_selected", "item": selected_result})
-            await refresh_ui()
 
         async def do_roll_next(e):
             nonlocal selected_result
+            reset_refresh_backoff()
+            touch_last_seen()
             if selected_result:
                 selected_result = sess.roll_next(current_session_id, selected_result)
+                result_text.value = selected_result or "No items available"
+                page.update(result_text)
                 broadcast_to_session({"action": "result_selected", "item": selected_result})
-                await refresh_ui()
 
         async def do_start_fresh(e):
+            reset_refresh_backoff()
             result = sess.vote_restart(current_session_id, current_member_id)
             if result["all_voted"]:
                 nonlocal selected_result
@@ -554,24 +777,25 @@ async def main(page: ft.Page):
 
         def close_export_dialog(e):
             export_dialog.open = False
-            page.update()
+            page.update(export_dialog)
 
         export_dialog = ft.AlertDialog(
             title=ft.Text("All Items"),
             content=ft.Column([
                 export_text_field,
                 ft.Container(height=10),
-                ft.ElevatedButton("Copy All", icon=ft.Icons.COPY, on_click=copy_export_text)
+                ft.ElevatedButton("Copy All", icon=Icons.COPY, on_click=copy_export_text)
             ], tight=True, horizontal_alignment=ft.CrossAxisAlignment.CENTER),
             actions=[ft.TextButton("Close", on_click=close_export_dialog)]
         )
 
-        def do_export(e):
-            all_items = sess.get_all_items(current_session_id)
-            export_text_field.value = "\n".join(all_items)
-            page.overlay.append(export_dialog)
-            export_dialog.open = True
-            page.update()
+        def build_export_text(session_id):
+            return "\n".join(sess.get_all_items(session_id))
+
+        async def do_export(e):
+            # Gather and join off the event loop so input and pubsub keep flowing
+            export_text_field.value = await asyncio.to_thread(build_export_text, current_session_id)
+            open_dialog(export_dialog)
 
         # View groups dialog
         groups_text_field = ft.TextField(
@@ -585,7 +809,7 @@ async def main(page: ft.Page):
 
         def close_groups_dialog(e):
             groups_dialog.open = False
-            page.update()
+            page.update(groups_dialog)
 
         groups_dialog = ft.AlertDialog(
             title=ft.Text("Acceptance Groups"),
@@ -607,9 +831,7 @@ async def main(page: ft.Page):
                 lines.append("")
 
             groups_text_field.value = "\n".join(lines) if lines else "No groups available"
-            page.overlay.append(groups_dialog)
-            groups_dialog.open = True
-            page.update()
+            open_dialog(groups_dialog)
 
         # Creator controls
         creator_controls = []
@@ -617,22 +839,22 @@ async def main(page: ft.Page):
             creator_controls = [
                 ft.Container(height=20),
                 ft.Row([
-                    ft.ElevatedButton("Re-roll", icon=ft.Icons.REFRESH, on_click=do_reroll),
-                    ft.ElevatedButton("Roll Next", icon=ft.Icons.SKIP_NEXT, on_click=do_roll_next),
+                    ft.ElevatedButton("Re-roll", icon=Icons.REFRESH, on_click=do_reroll),
+                    ft.ElevatedButton("Roll Next", icon=Icons.SKIP_NEXT, on_click=do_roll_next),
                 ], alignment=ft.MainAxisAlignment.CENTER, spacing=10),
                 ft.Container(height=10),
                 ft.ElevatedButton(
                     "Start Fresh",
-                    icon=ft.Icons.RESTART_ALT,
+                    icon=Icons.RESTART_ALT,
                     on_click=do_start_fresh,
-                    bgcolor=ft.Colors.ORANGE_400
+                    bgcolor=Colors.ORANGE_400
                 )
             ]
 
         # View Groups button (available to everyone)
         view_groups_btn = ft.ElevatedButton(
             "View Groups",
-            icon=ft.Icons.LIST_ALT,
+            icon=Icons.LIST_ALT,
             on_click=do_view_groups
         )
 
@@ -644,7 +866,7 @@ async def main(page: ft.Page):
                 ft.Text(
                     f"Restart votes: {state['restart_votes']} of {state['total_members']}",
                     size=12,
-                    color=ft.Colors.ORANGE_400
+                    color=Colors.ORANGE_400
                 )
             ]
 
@@ -658,7 +880,7 @@ async def main(page: ft.Page):
                 view_groups_btn,
                 ft.ElevatedButton(
                     "Export All Items",
-                    icon=ft.Icons.DOWNLOAD,
+                    icon=Icons.DOWNLOAD,
                     on_click=do_export
                 ),
             ], alignment=ft.MainAxisAlignment.CENTER, spacing=10),
@@ -669,6 +891,7 @@ async def main(page: ft.Page):
     def leave_session_button():
         async def leave(e):
             nonlocal current_session_id, current_member_id, selected_result
+            flush_accepted_save()
             unsubscribe_from_session()
             await page.shared_preferences.remove(STORAGE_SESSION_ID)
             current_session_id = None
@@ -704,18 +927,35 @@ async def main(page: ft.Page):
 
         await show_landing()
 
-    # Cleanup expired sessions periodically
-    db.cleanup_expired_sessions()
+    # Expired sessions are swept by one background thread per process
+    start_cleanup_thread()
 
     # Handle page close
+    # Keeps connected but idle members from being auto-readied
+    async def heartbeat_loop():
+        while not page_closed:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            touch_last_seen()
+
     def on_close(e):
+        nonlocal page_closed
+        page_closed = True
+        flush_accepted_save()
         unsubscribe_from_session()
 
     page.on_close = on_close
 
     # Handle window resize
     def on_resize(e):
-        page.update()
+        nonlocal content_width
+        new_width = compute_content_width()
+        if new_width == content_width:
+            return
+        content_width = new_width
+        for control in width_controls:
+            control.width = new_width
+        if width_controls:
+            page.update(*width_controls)
 
     page.on_resize = on_resize
 
@@ -727,9 +967,13 @@ async def main(page: ft.Page):
     )
 
     # Initialize
+    page.run_task(heartbeat_loop)
     await check_existing_session()
 
 
+# Create or migrate the database schema once per process
+db.init_database()
+
 # For ASGI deployment
 app = ft.run(main, export_asgi_app=True)
 
@@ -3,75 +3,82 @@ Session management module with business logic.
 """
 
 import random
-import re
-import string
+import secrets
+import threading
 import time
 import uuid
+from dataclasses import dataclass
+from itertools import chain
 from typing import Optional
 from collections import defaultdict
 
 import database as db
+# Text helpers live in their own module so they can be compiled with mypyc
+from _session_text import normalize_item, is_duplicate_item, is_storable_item
 
 # Characters for session codes (excluding confusing ones: 0, O, 1, I, L)
 SESSION_CODE_CHARS = "23456789ABCDEFGHJKMNPQRSTUVWXYZ"
 SESSION_CODE_LENGTH = 6
 
+# Collisions are rare; give up after this many taken codes in a row
+SESSION_CODE_ATTEMPTS = 10
+
+# Random bytes map onto SESSION_CODE_CHARS through a translate table. Bytes
+# past the last full multiple of the alphabet size are dropped so every
+# character stays equally likely.
+_CODE_ALPHABET = SESSION_CODE_CHARS.encode()
+_CODE_TABLE = bytes(_CODE_ALPHABET[b % len(_CODE_ALPHABET)] for b in range(256))
+_CODE_REJECT = bytes(range(256 - 256 % len(_CODE_ALPHABET), 256))
+
 # Timeout for auto-ready (2 minutes)
 AUTO_READY_TIMEOUT = 2 * 60
 
+# The creator counts as connected if seen within this many seconds
+CREATOR_CONNECTED_TIMEOUT = 30
+
 # Session phases
 PHASE_ADDING = "adding"
 PHASE_ACCEPTING = "accepting"
 PHASE_RESULT = "result"
 
 
-def generate_session_code() -> str:
-    """Generate a unique 6-character session code."""
-    while True:
-        code = "".join(random.choices(SESSION_CODE_CHARS, k=SESSION_CODE_LENGTH))
-        if not db.session_exists(code):
-            return code
+@dataclass(frozen=True)
+class SessionIndex:
+    """Normalized items, their acceptors and the resulting groups of one session."""
+    normalized_to_original: dict
+    item_acceptances: dict
+    excluded_norm: set
+    groups: dict
 
 
-def generate_member_id() -> str:
-    """Generate a unique member ID."""
-    return str(uuid.uuid4())
-
-
-def normalize_item(item: str) -> str:
-    """
-    Normalize an item for comparison.
-    Strips whitespace, special characters, and converts to lowercase.
-    """
-    # Remove all whitespace
-    normalized = re.sub(r"\s+", "", item)
-    # Remove all special characters (keep only alphanumeric)
-    normalized = re.sub(r"[^a-zA-Z0-9]", "", normalized)
-    # Convert to lowercase
-    return normalized.lower()
+# Per-session grouping cache so rerolls don't re-read and regroup every
+# member. Dropped by the item/acceptance writes below; a build that raced a
+# write (generation moved on) is used once but not stored.
+_session_indexes = {}
+_index_generation = 0
+_index_lock = threading.Lock()
 
 
-def items_equal(item1: str, item2: str) -> bool:
-    """Check if two items are equal after normalization."""
-    return normalize_item(item1) == normalize_item(item2)
+def generate_session_code() -> str:
+    """Generate a random 6-character session code (uniqueness is enforced on insert)."""
+    code = b""
+    while len(code) < SESSION_CODE_LENGTH:
+        code += secrets.token_bytes(SESSION_CODE_LENGTH).translate(_CODE_TABLE, _CODE_REJECT)
+    return code[:SESSION_CODE_LENGTH].decode()
 
 
-def is_duplicate_item(new_item: str, existing_items: list) -> bool:
-    """Check if a new item is a duplicate of any existing item."""
-    new_normalized = normalize_item(new_item)
-    if not new_normalized:
-        return True  # Empty items are considered duplicates
-    for item in existing_items:
-        if normalize_item(item) == new_normalized:
-            return True
-    return False
+def generate_member_id() -> str:
+    """Generate a unique member ID."""
+    return str(uuid.uuid4())
 
 
 def create_session(creator_id: str) -> Optional[str]:
     """Create a new session and return the session code."""
-    session_code = generate_session_code()
-    if db.create_session(session_code, creator_id):
-        return session_code
+    # The primary key rejects taken codes, so the insert doubles as the check
+    for _ in range(SESSION_CODE_ATTEMPTS):
+        session_code = generate_session_code()
+        if db.create_session(session_code, creator_id):
+            return session_code
     return None
 
 
@@ -93,7 +100,7 @@ def join_session(session_code: str, member_id: str) -> dict:
         return {
             "success": True,
             "rejoined": True,
-            "is_observer": existing_member["is_observer"],
+            "is_observer": bool(existing_member.is_observer),
             "phase": session["phase"]
         }
 
@@ -116,21 +123,26 @@ def add_item(session_id: str, member_id: str, item: str) -> dict:
     if not item:
         return {"success": False, "error": "Item cannot be empty"}
 
+    if not is_storable_item(item):
+        return {"success": False, "error": "Item contains invalid characters"}
+
     member = db.get_member(session_id, member_id)
     if not member:
         return {"success": False, "error": "Member not found"}
 
-    if member["is_observer"]:
+    if member.is_observer:
         return {"success": False, "error": "Observers cannot add items"}
 
-    if member["is_ready"]:
+    if member.is_ready:
         return {"success": False, "error": "Cannot add items after marking ready"}
 
-    if is_duplicate_item(item, member["items"]):
+    items = member.items
+    if is_duplicate_item(item, items):
         return {"success": False, "error": "Duplicate item"}
 
-    items = member["items"] + [item]
-    db.update_member_items(session_id, member_id, items)
+    db.append_member_item(session_id, member_id, item)
+    invalidate_session_index(session_id)
+    items.append(item)
     return {"success": True, "items": items}
 
 
@@ -140,15 +152,19 @@ def remove_item(session_id: str, member_id: str, item_index: int) -> dict:
     if not member:
         return {"success": False, "error": "Member not found"}
 
-    if member["is_ready"]:
+    if member.is_ready:
         return {"success": False, "error": "Cannot remove items after marking ready"}
 
-    if item_index < 0 or item_index >= len(member["items"]):
+    items = member.items
+    if item_index < 0 or item_index >= len(items):
         return {"success": False, "error": "Invalid item index"}
 
-    items = member["items"].copy()
+    # The list may have changed since it was read (e.g. another tab)
+    if not db.delete_member_item_at(session_id, member_id, item_index):
+        return {"success": False, "error": "Invalid item index"}
+    invalidate_session_index(session_id)
+    # member.items is decoded fresh for this call, so popping needs no copy
     items.pop(item_index)
-    db.update_member_items(session_id, member_id, items)
     return {"success": True, "items": items}
 
 
@@ -158,30 +174,50 @@ def set_ready(session_id: str, member_id: str, is_ready: bool) -> dict:
     if not member:
         return {"success": False, "error": "Member not found"}
 
-    if member["is_observer"]:
+    if member.is_observer:
         return {"success": False, "error": "Observers cannot set ready status"}
 
     db.set_member_ready(session_id, member_id, is_ready)
-    return {"success": True}
+    status = get_ready_status(session_id)
 
+    # At most one caller wins the phase transition, see check_and_advance_phase
+    new_phase = None
+    if is_ready and status["all_ready"]:
+        new_phase = check_and_advance_phase(session_id, status)
 
-def get_ready_status(session_id: str) -> dict:
-    """Get the ready status for all members."""
-    members = db.get_active_members(session_id)
+    return {
+        "success": True,
+        "should_advance": new_phase is not None,
+        "new_phase": new_phase,
+        "ready_count": status["ready"],
+        "total_members": status["total"]
+    }
+
+
+def get_ready_status(session_id: str, members: Optional[list] = None) -> dict:
+    """
+    Get the ready status for all members.
+    Pass the session's active members to avoid reading them again.
+    """
+    if members is None:
+        members = db.get_active_members(session_id)
     now = time.time()
 
     ready_count = 0
     total_count = len(members)
+    timed_out = []
 
     for member in members:
         # Check if member is ready or has timed out
-        if member["is_ready"]:
+        if member.is_ready:
             ready_count += 1
-        elif now - member["last_seen"] > AUTO_READY_TIMEOUT:
-            # Auto-ready disconnected members
-            db.set_member_ready(session_id, member["member_id"], True)
+        elif now - member.last_seen > AUTO_READY_TIMEOUT:
+            timed_out.append(member.member_id)
             ready_count += 1
 
+    # Auto-ready disconnected members
+    db.batch_set_members_ready(session_id, timed_out, True)
+
     return {
         "ready": ready_count,
         "total": total_count,
@@ -189,16 +225,20 @@ def get_ready_status(session_id: str) -> dict:
     }
 
 
-def check_and_advance_phase(session_id: str) -> Optional[str]:
+def check_and_advance_phase(session_id: str, status: Optional[dict] = None) -> Optional[str]:
     """
     Check if all members are ready and advance to next phase.
-    Returns the new phase if advanced, None otherwise.
+    Returns the new phase if this call advanced it, None otherwise.
+    The transition is a compare-and-swap in the database, so concurrent
+    callers cannot both advance the same phase.
+    Pass a ready status just computed by get_ready_status() to reuse it.
     """
     session = db.get_session(session_id)
     if not session:
         return None
 
-    status = get_ready_status(session_id)
+    if status is None:
+        status = get_ready_status(session_id)
     if not status["all_ready"]:
         return None
 
@@ -206,14 +246,13 @@ def check_and_advance_phase(session_id: str) -> Optional[str]:
 
     if current_phase == PHASE_ADDING:
         # Advance to acceptance phase
-        db.reset_all_ready_status(session_id)
-        db.set_session_phase(session_id, PHASE_ACCEPTING)
-        return PHASE_ACCEPTING
+        if db.advance_session_phase(session_id, PHASE_ADDING, PHASE_ACCEPTING, reset_ready=True):
+            return PHASE_ACCEPTING
 
     elif current_phase == PHASE_ACCEPTING:
         # Advance to result phase
-        db.set_session_phase(session_id, PHASE_RESULT)
-        return PHASE_RESULT
+        if db.advance_session_phase(session_id, PHASE_ACCEPTING, PHASE_RESULT):
+            return PHASE_RESULT
 
     return None
 
@@ -221,29 +260,28 @@ def check_and_advance_phase(session_id: str) -> Optional[str]:
 def get_items_for_acceptance(session_id: str, member_id: str) -> list:
     """Get all items except the member's own items for acceptance."""
     members = db.get_active_members(session_id)
-    items = []
-
-    for member in members:
-        if member["member_id"] != member_id:
-            for item in member["items"]:
-                # Avoid duplicates in the display list
-                if not any(items_equal(item, existing) for existing in items):
-                    items.append(item)
-
-    return items
+    # Avoid duplicates in the display list
+    return _dedupe_items(list(chain.from_iterable(
+        m.items for m in members if m.member_id != member_id
+    )))
 
 
-def get_all_items(session_id: str) -> list:
-    """Get all items from all members."""
-    members = db.get_active_members(session_id)
-    items = []
+def get_all_items(session_id: str, members: Optional[list] = None) -> list:
+    """
+    Get all items from all members.
+    Pass the session's active members to avoid reading them again.
+    """
+    if members is None:
+        members = db.get_active_members(session_id)
+    return _dedupe_items(list(chain.from_iterable(m.items for m in members)))
 
-    for member in members:
-        for item in member["items"]:
-            if not any(items_equal(item, existing) for existing in items):
-                items.append(item)
 
-    return items
+def _dedupe_items(items: list) -> list:
+    """Drop items that normalize to an earlier one, keeping the first spelling in order."""
+    keys = list(map(normalize_item, items))
+    # Reversed so the first spelling of each key is the one that sticks
+    first_spelling = dict(zip(reversed(keys), reversed(items)))
+    return [first_spelling[key] for key in dict.fromkeys(keys)]
 
 
 def set_accepted_items(session_id: str, member_id: str, accepted_items: list) -> dict:
@@ -252,81 +290,135 @@ def set_accepted_items(session_id: str, member_id: str, accepted_items: list) ->
     if not member:
         return {"success": False, "error": "Member not found"}
 
-    if member["is_observer"]:
+    if member.is_observer:
         return {"success": False, "error": "Observers cannot accept items"}
 
+    # Items that cannot be stored can't have been added, so drop them
+    accepted_items = [item for item in accepted_items if is_storable_item(item)]
     db.update_member_accepted_items(session_id, member_id, accepted_items)
+    invalidate_session_index(session_id)
     return {"success": True}
 
 
 def fair_random_select(length: int) -> int:
-    """
-    Fair random selection using the specified algorithm.
-    rnd = random.randint(length * 10000, length * 90000)
-    index = rnd % length
-    """
+    """Fair random selection of an index in range(length)."""
     if length <= 0:
         return 0
-    rnd = random.randint(length * 10000, length * 90000)
-    return rnd % length
+    return random.randrange(length)
 
 
-def group_items_by_acceptance(session_id: str) -> dict:
-    """
-    Group items by their acceptance patterns.
-    Returns a dict where keys are frozensets of member IDs who accepted,
-    and values are lists of items.
-    """
+def invalidate_session_index(session_id: str):
+    """Drop the cached grouping of a session after its items or acceptances change."""
+    global _index_generation
+    with _index_lock:
+        _index_generation += 1
+        _session_indexes.pop(session_id, None)
+
+
+def clear_session_indexes():
+    """Drop every cached grouping (e.g. after expired sessions were removed)."""
+    global _index_generation
+    with _index_lock:
+        _index_generation += 1
+        _session_indexes.clear()
+
+
+def _group_items(normalized_to_original: dict, item_acceptances: dict, excluded_norm: set) -> dict:
+    """Group the non-excluded items by the set of members accepting them."""
+    groups = defaultdict(list)
+    for norm, original in normalized_to_original.items():
+        # Skip excluded items
+        if norm in excluded_norm:
+            continue
+
+        acceptors = frozenset(item_acceptances[norm])
+        if acceptors:  # Only include items that have at least one acceptor
+            groups[acceptors].append(original)
+
+    return dict(groups)
+
+
+def _build_session_index(session_id: str) -> SessionIndex:
+    """Read a session's members and exclusions and build its index."""
     members = db.get_active_members(session_id)
-    excluded = db.get_excluded_items(session_id)
+    excluded_norm = set(map(normalize_item, db.get_excluded_items(session_id)))
 
     # Build a mapping of normalized item -> original item
     # and track which members accept each item
     item_acceptances = defaultdict(set)
     normalized_to_original = {}
 
+    # Collect every member's items first, so accepting an item from a member
+    # who joined later still counts
     for member in members:
-        member_id = member["member_id"]
-
         # Member's own items are auto-accepted
-        for item in member["items"]:
+        for item in member.items:
             norm = normalize_item(item)
             if norm not in normalized_to_original:
                 normalized_to_original[norm] = item
-            item_acceptances[norm].add(member_id)
+            item_acceptances[norm].add(member.member_id)
 
-        # Explicitly accepted items
-        for item in member["accepted_items"]:
-            norm = normalize_item(item)
-            if norm in normalized_to_original:
-                item_acceptances[norm].add(member_id)
+    # Explicitly accepted items, limited to items that actually exist
+    for member in members:
+        accepted_norm = set(map(normalize_item, member.accepted_items))
+        for norm in accepted_norm.intersection(normalized_to_original):
+            item_acceptances[norm].add(member.member_id)
 
-    # Group by acceptance pattern
-    groups = defaultdict(list)
-    for norm, original in normalized_to_original.items():
-        # Skip excluded items
-        if any(items_equal(original, ex) for ex in excluded):
-            continue
+    groups = _group_items(normalized_to_original, item_acceptances, excluded_norm)
+    return SessionIndex(normalized_to_original, item_acceptances, excluded_norm, groups)
 
-        acceptors = frozenset(item_acceptances[norm])
-        if acceptors:  # Only include items that have at least one acceptor
-            groups[acceptors].append(original)
 
-    return dict(groups)
+def get_session_index(session_id: str) -> SessionIndex:
+    """Return the cached index of a session, building it on first use."""
+    with _index_lock:
+        index = _session_indexes.get(session_id)
+        generation = _index_generation
+    if index is not None:
+        return index
+
+    index = _build_session_index(session_id)
+    with _index_lock:
+        if generation == _index_generation:
+            _session_indexes[session_id] = index
+    return index
 
 
-def select_item(session_id: str) -> Optional[str]:
+def group_items_by_acceptance(session_id: str, excluded: Optional[list] = None) -> dict:
+    """
+    Group items by their acceptance patterns.
+    Returns a dict where keys are frozensets of member IDs who accepted,
+    and values are lists of items.
+    Without excluded the cached exclusions are used; passing the session's
+    current excluded items regroups the cached index without a DB read.
+    """
+    index = get_session_index(session_id)
+    if excluded is not None:
+        excluded_norm = set(map(normalize_item, excluded))
+        if excluded_norm != index.excluded_norm:
+            groups = _group_items(index.normalized_to_original, index.item_acceptances, excluded_norm)
+            regrouped = SessionIndex(index.normalized_to_original, index.item_acceptances, excluded_norm, groups)
+            # Indexes are never changed in place; swap unless a write dropped it meanwhile
+            with _index_lock:
+                if _session_indexes.get(session_id) is index:
+                    _session_indexes[session_id] = regrouped
+            index = regrouped
+    return dict(index.groups)
+
+
+def select_item(session_id: str, excluded: Optional[list] = None) -> Optional[str]:
     """
     Select an item using the fair selection algorithm.
     First picks a random group, then a random item within that group.
+    The pick is stored as the session result so every client shows the same one.
     """
-    groups = group_items_by_acceptance(session_id)
+    groups = group_items_by_acceptance(session_id, excluded)
 
     if not groups:
         # If all items are excluded, reset the pool
         db.clear_excluded_items(session_id)
-        groups = group_items_by_acceptance(session_id)
+        groups = group_items_by_acceptance(session_id, [])
         if not groups:
+            db.set_session_result(session_id, None)
             return None
 
     # Pick a random group
@@ -336,7 +428,9 @@ def select_item(session_id: str) -> Optional[str]:
 
     # Pick a random item from the group
     item_index = fair_random_select(len(selected_group))
-    return selected_group[item_index]
+    result = selected_group[item_index]
+    db.set_session_result(session_id, result)
+    return result
 
 
 def reroll(session_id: str) -> Optional[str]:
@@ -347,21 +441,23 @@ def reroll(session_id: str) -> Optional[str]:
 def roll_next(session_id: str, current_item: str) -> Optional[str]:
     """Roll next: exclude current item and pick again."""
     excluded = db.get_excluded_items(session_id)
-    if not any(items_equal(current_item, ex) for ex in excluded):
+    excluded_norm = set(map(normalize_item, excluded))
+    if normalize_item(current_item) not in excluded_norm:
+        db.add_excluded_item(session_id, current_item)
         excluded.append(current_item)
-        db.set_excluded_items(session_id, excluded)
 
-    return select_item(session_id)
+    # Reuse the list we already have instead of reading it again
+    return select_item(session_id, excluded)
 
 
 def vote_restart(session_id: str, member_id: str) -> dict:
     """Add a restart vote."""
     db.add_restart_vote(session_id, member_id)
-    votes = db.get_restart_votes(session_id)
+    votes = set(db.get_restart_votes(session_id))
     members = db.get_active_members(session_id)
 
     # Check if all members voted
-    all_voted = all(m["member_id"] in votes for m in members)
+    all_voted = len(votes) >= len(members) and votes.issuperset(m.member_id for m in members)
 
     return {
         "votes": len(votes),
@@ -372,13 +468,8 @@ def vote_restart(session_id: str, member_id: str) -> dict:
 
 def start_fresh(session_id: str):
     """Reset the session for a fresh start."""
-    db.clear_all_items(session_id)
-    db.reset_all_ready_status(session_id)
-    db.reset_all_accepted_items(session_id)
-    db.clear_excluded_items(session_id)
-    db.clear_restart_votes(session_id)
-    db.promote_observers(session_id)
-    db.set_session_phase(session_id, PHASE_ADDING)
+    db.reset_session_state(session_id, PHASE_ADDING)
+    invalidate_session_index(session_id)
 
 
 def leave_session(session_id: str, member_id: str):
@@ -405,34 +496,42 @@ def is_creator_connected(session_id: str) -> bool:
         return False
 
     # Consider connected if seen in the last 30 seconds
-    return time.time() - member["last_seen"] < 30
+    return time.time() - member.last_seen < CREATOR_CONNECTED_TIMEOUT
 
 
 def get_session_state(session_id: str, member_id: str) -> dict:
     """Get the full session state for a member."""
-    session = db.get_session(session_id)
-    if not session:
+    # Everything below is derived from one read of the session and its members
+    snapshot = db.get_session_snapshot(session_id)
+    if not snapshot:
         return {"error": "Session not found"}
+    session, members, restart_votes, _ = snapshot
 
-    member = db.get_member(session_id, member_id)
+    by_id = {m.member_id: m for m in members}
+    member = by_id.get(member_id)
     if not member:
         return {"error": "Member not found"}
 
-    members = db.get_active_members(session_id)
-    ready_status = get_ready_status(session_id)
+    active_members = [m for m in members if not m.is_observer]
+    ready_status = get_ready_status(session_id, active_members)
+    creator = by_id.get(session["creator_id"])
 
     return {
         "session_id": session_id,
         "phase": session["phase"],
-        "is_creator": is_creator(session_id, member_id),
-        "creator_connected": is_creator_connected(session_id),
-        "is_observer": member["is_observer"],
-        "my_items": member["items"],
-        "my_accepted_items": member["accepted_items"],
-        "is_ready": member["is_ready"],
+        "is_creator": session["creator_id"] == member_id,
+        "creator_connected": (
+            creator is not None
+            and time.time() - creator.last_seen < CREATOR_CONNECTED_TIMEOUT
+        ),
+        "is_observer": bool(member.is_observer),
+        "my_items": member.items,
+        "my_accepted_items": member.accepted_items,
+        "is_ready": bool(member.is_ready),
         "ready_count": ready_status["ready"],
         "total_members": ready_status["total"],
         "all_ready": ready_status["all_ready"],
-        "restart_votes": len(db.get_restart_votes(session_id)),
-        "all_items": get_all_items(session_id) if session["phase"] == PHASE_RESULT else []
+        "result": session["result"],
+        "restart_votes": len(restart_votes),
+        "all_items": get_all_items(session_id, active_members) if session["phase"] == PHASE_RESULT else []
     }